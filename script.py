@@ -1,43 +1,168 @@
 # Imports and Setup
+import csv
+import dbm
+import hashlib
+import shelve
+import numpy as np
 import pandas as pd
 from openpyxl import load_workbook
+from openpyxl.utils.cell import column_index_from_string, coordinate_from_string
 import click
 import formulas
+from formulas.tokens.operand import Range
 import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path  # Use Path for cleaner path handling
 
+# pyarrow is optional; when present it writes the --pandas CSV files and
+# a .feather copy of every CSV file for the generated CLI to load
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as pa_feather
+except ImportError:
+    pa = pa_csv = pa_feather = None
+
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# A single parser is reused for every formula (and in each worker
+# process); Parser.ast keeps no state between calls
+parser = formulas.Parser()
+
+# Cell and range references, optionally sheet-qualified ('My Sheet'!A1,
+# Sheet2!$B$2:$C$9, [1]Sheet1!A1 for external workbooks), plus whole-column
+# (A:C) and whole-row (1:3) ranges. The lookarounds keep function names
+# such as LOG10( and defined names from matching.
+_RANGE_RE = re.compile(
+    r"(?<![\w.$'!:\]])"
+    r"(?:'(?:[^']|'')+'!|(?:\[\d+\])?[A-Za-z_][\w.]*!)?"
+    r"(?:\$?[A-Z]{1,3}\$?\d+(?::\$?[A-Z]{1,3}\$?\d+)?"
+    r"|\$?[A-Z]{1,3}:\$?[A-Z]{1,3}"
+    r"|\$?\d+:\$?\d+)"
+    r"(?![\w(!:])"
+)
+# String literals ("..." with "" as an escaped quote) are blanked before
+# scanning so text like "A1" is not reported as a reference
+_STRING_LITERAL_RE = re.compile(r'"(?:[^"]|"")*"')
+# A1-style cell references and whole-column (A:C) / whole-row (1:3)
+# ranges for R1C1 conversion. String literals and quoted sheet names are
+# matched first so their contents are left alone.
+_A1_CELL_RE = re.compile(
+    r"(?P<literal>\"(?:[^\"]|\"\")*\"|'(?:[^']|'')*')"
+    r"|(?<![\w.$])(?P<col_abs>\$?)(?P<col>[A-Z]{1,3})"
+    r"(?P<row_abs>\$?)(?P<row>\d+)(?![\w(!])"
+    r"|(?<![\w.$:])(?P<col1_abs>\$?)(?P<col1>[A-Z]{1,3})"
+    r":(?P<col2_abs>\$?)(?P<col2>[A-Z]{1,3})(?![\w(!:])"
+    r"|(?<![\w.$:])(?P<row1_abs>\$?)(?P<row1>\d+)"
+    r":(?P<row2_abs>\$?)(?P<row2>\d+)(?![\w(!:])"
+)
+
+# Number of formulas handed to a worker process at a time in --strict mode
+FORMULA_BATCH_SIZE = 256
+
+# --strict parse results persist here between runs
+FORMULA_CACHE_PATH = Path.home() / ".cache" / "excel-to-python" / "ast.db"
+
+# Sheet scans are bounded by a row cap. Files that store thousands of
+# empty rows can also opt in to stopping after a run of consecutive empty
+# rows; that may skip formulas below a large gap, so it is off (0) by
+# default
+MAX_ROWS = 1_048_576
+MAX_EMPTY_ROWS = 0
+
 
 # CLI Interface with Click
 @click.command()
 @click.argument('excel_filepath', type=click.Path(exists=True))
-def convert_excel_to_python(excel_filepath):
+@click.option('--strict', is_flag=True,
+              help="Use the full formulas parser to find referenced cells "
+                   "(skips formulas it can't parse).")
+@click.option('--pandas', 'use_pandas', is_flag=True,
+              help="Build pandas DataFrames before writing the CSV files.")
+@click.option('--dedup', is_flag=True,
+              help="Write each distinct formula once, as R1C1 templates plus "
+                   "a cell-to-template table.")
+@click.option('--max-rows', type=click.IntRange(min=1), default=MAX_ROWS,
+              show_default=True, help="Maximum number of rows read per sheet.")
+@click.option('--max-empty-rows', type=click.IntRange(min=0),
+              default=MAX_EMPTY_ROWS, show_default=True,
+              help="Stop reading a sheet after this many consecutive empty "
+                   "rows (0 reads to the end).")
+def convert_excel_to_python(excel_filepath, strict, use_pandas, dedup,
+                            max_rows, max_empty_rows):
+    if use_pandas and dedup:
+        raise click.UsageError("--dedup can't be combined with --pandas.")
     try:
         # Use pathlib for cleaner path handling
-        dataframes = create_dataframes_from_excel(Path(excel_filepath))
-        save_output_files(Path(excel_filepath), dataframes)
+        excel_filepath = Path(excel_filepath)
+        if use_pandas:
+            dataframes = create_dataframes_from_excel(
+                excel_filepath, strict, max_rows, max_empty_rows)
+            save_output_files(excel_filepath, dataframes)
+        else:
+            # Write the CSV files straight from the parsed formulas
+            sheets_data = parse_excel_file(
+                excel_filepath, strict, max_rows, max_empty_rows)
+            save_data = save_sheets_templates if dedup else save_sheets_data
+            save_output_files(excel_filepath, sheets_data, save_data)
     except Exception as e:
         logger.error(f"Failed to convert Excel file: {e}")
         raise click.ClickException(f"An error occurred during conversion: {e}")
 
 
 # Excel Parsing Logic
-def parse_excel_file(excel_filepath):
+def parse_excel_file(excel_filepath, strict=False, max_rows=MAX_ROWS,
+                     max_empty_rows=MAX_EMPTY_ROWS):
     try:
         # Convert to Path and use `resolve` for full path
         excel_filepath = Path(excel_filepath).resolve()
-        workbook = load_workbook(excel_filepath, data_only=False)
-        sheets_data = {}
+        # read_only streams the sheets instead of building the full DOM;
+        # we only ever make a single forward pass over each sheet
+        workbook = load_workbook(
+            excel_filepath, read_only=True, data_only=False, keep_links=False)
         logger.info(f"Processing Excel file: {excel_filepath}")
 
-        for sheet_name in workbook.sheetnames:
-            logger.info(f"Processing sheet: {sheet_name}")
-            sheet = workbook[sheet_name]
-            sheet_data = extract_formulas_from_sheet(sheet)
+        # openpyxl isn't process-safe, so read every sheet here and only
+        # farm out the formula parsing
+        formulas_by_sheet = {}
+        try:
+            for sheet_name in workbook.sheetnames:
+                logger.info(f"Processing sheet: {sheet_name}")
+                sheet = workbook[sheet_name]
+                # The dimension recorded in the file may under-report the
+                # used range, and read-only sheets stop at it. Let the row
+                # elements decide instead; missing trailing rows are never
+                # filled in, so this costs nothing for inflated dimensions.
+                sheet.reset_dimensions()
+                sheet_formulas = extract_formulas_from_sheet(
+                    sheet, sheet_name, max_rows, max_empty_rows)
+                if sheet_formulas:
+                    formulas_by_sheet[sheet_name] = sheet_formulas
+        finally:
+            # Read-only workbooks keep the archive open until closed
+            workbook.close()
+
+        if strict:
+            references = get_strict_referenced_cells({
+                formula
+                for sheet_formulas in formulas_by_sheet.values()
+                for _, formula in sheet_formulas
+            })
+            lookup = references.get
+        else:
+            lookup = get_referenced_cells
+
+        sheets_data = {}
+        for sheet_name, sheet_formulas in formulas_by_sheet.items():
+            sheet_data = parse_formula_batch(sheet_formulas, lookup)
             if sheet_data:
                 sheets_data[sheet_name] = sheet_data
 
@@ -51,39 +176,124 @@ def parse_excel_file(excel_filepath):
         raise click.ClickException(f"Failed to parse Excel file: {e}")
 
 
-def extract_formulas_from_sheet(sheet):
-    formulas_data = {}
+def extract_formulas_from_sheet(sheet, sheet_name=None, max_rows=MAX_ROWS,
+                                max_empty_rows=MAX_EMPTY_ROWS):
+    # Callers usually already know the name; avoid the property lookup
+    if sheet_name is None:
+        sheet_name = sheet.title
+    sheet_formulas = []
     try:
-        for row in sheet.iter_rows():
+        # max_row is None for read-only sheets with their dimensions reset;
+        # only max_rows bounds those
+        max_row = min(sheet.max_row or max_rows, max_rows)
+        empty_rows = 0
+        rows = sheet.iter_rows(min_row=1, max_row=max_row)
+        for row_idx, row in enumerate(rows, start=1):
+            if all(cell.value is None for cell in row):
+                empty_rows += 1
+                if max_empty_rows and empty_rows >= max_empty_rows:
+                    # Warn, since anything further down is skipped
+                    logger.warning(
+                        f"Stopping at row {row_idx} of sheet {sheet_name} "
+                        f"after {empty_rows} empty rows (--max-empty-rows)")
+                    break
+                continue
+            empty_rows = 0
+
             for cell in row:
-                if cell.data_type == 'f':  # Check if the cell contains a formula
-                    formula = cell.value
-                    referenced_cells = get_referenced_cells(formula)
-                    if referenced_cells is not None:
-                        formulas_data[cell.coordinate] = {
-                            'formula': formula,
-                            'referenced_cells': referenced_cells
-                        }
-        return formulas_data if formulas_data else None
+                value = cell.value
+                # Formulas are stored as strings starting with '=' when the
+                # workbook is not data_only. The cheap prefix test rules out
+                # almost every cell; data_type then only has to reject
+                # quote-prefixed text such as '=B1
+                if (isinstance(value, str) and value.startswith('=')
+                        and cell.data_type == 'f'):
+                    sheet_formulas.append((cell.coordinate, value))
+        return sheet_formulas if sheet_formulas else None
     except Exception as e:
         logger.error(
-            f"Error while extracting formulas from sheet {sheet.title}: {e}")
+            f"Error while extracting formulas from sheet {sheet_name}: {e}")
         raise
 
 
-def get_referenced_cells(formula):
+def parse_formula_batch(sheet_formulas, lookup):
+    formulas_data = {}
+
+    for coordinate, formula in sheet_formulas:
+        referenced_cells = lookup(formula)
+        if referenced_cells is not None:
+            formulas_data[coordinate] = {
+                'formula': formula,
+                'referenced_cells': referenced_cells
+            }
+
+    return formulas_data
+
+
+def get_strict_referenced_cells(formula_texts):
+    # Parse each distinct formula once across all sheets. Results already
+    # in the on-disk cache are reused; the rest go to worker processes when
+    # there are enough of them to be worth it. Only this process touches the
+    # cache, since shelve doesn't support concurrent writers.
+    references = {}
+    with open_formula_cache() as cache:
+        missing = []
+        for formula in formula_texts:
+            key = formula_cache_key(formula)
+            if key in cache:
+                references[formula] = cache[key]
+            else:
+                missing.append(formula)
+
+        logger.info(
+            f"Found {len(references)} of {len(formula_texts)} formulas in cache")
+
+        if len(missing) > FORMULA_BATCH_SIZE:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                parsed = list(executor.map(
+                    get_referenced_cells, missing, repeat(True),
+                    chunksize=FORMULA_BATCH_SIZE))
+        else:
+            parsed = [get_referenced_cells(formula, True) for formula in missing]
+
+        for formula, referenced_cells in zip(missing, parsed):
+            references[formula] = referenced_cells
+            # Failures aren't cached so they are retried (and logged) next run
+            if referenced_cells is not None:
+                cache[formula_cache_key(formula)] = referenced_cells
+
+    return references
+
+
+def open_formula_cache():
     try:
-        parser = formulas.Parser()
-        parsed_formula = parser.ast(formula).parsed
-        referenced_cells = []
+        FORMULA_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        return shelve.open(str(FORMULA_CACHE_PATH))
+    except dbm.error as e:
+        logger.warning(f"Formula cache unavailable, parsing all formulas: {e}")
+        return nullcontext({})
+
 
-        for token in parsed_formula:
-            if token.ptg == 'operand' and token.subtype == 'range':
-                referenced_cells.append(token.value)
+def formula_cache_key(formula):
+    # Results depend on the parser, so its version is part of the key
+    return hashlib.sha1(
+        f"{formulas.__version__}:{formula}".encode()).hexdigest()
 
-        return referenced_cells
 
-    except formulas.exc.FormulaError as e:
+# Copy-filled columns repeat the same formula text many times, so look up
+# each distinct formula only once. Results are tuples so the cached value
+# can't be mutated by callers.
+@lru_cache(maxsize=None)
+def get_referenced_cells(formula, strict=False):
+    if not strict:
+        return tuple(_RANGE_RE.findall(_STRING_LITERAL_RE.sub('""', formula)))
+
+    try:
+        parsed_formula = parser.ast(formula)[0]
+        return tuple(token.attr['name'] for token in parsed_formula
+                     if isinstance(token, Range))
+
+    except formulas.errors.FormulaError as e:
         logger.warning(f"Formula parsing error for '{formula}': {e}")
         return None  # Return None if formula parsing fails
     except Exception as e:
@@ -91,10 +301,46 @@ def get_referenced_cells(formula):
         return None  # Catch all unexpected exceptions
 
 
+def to_r1c1(formula, coordinate):
+    # Relative references become offsets from the host cell, so copy-filled
+    # formulas like =A1*2 in B1 and =A2*2 in B2 both read =RC[-1]*2
+    col_letters, row = coordinate_from_string(coordinate)
+    host_col = column_index_from_string(col_letters)
+
+    def row_part(ref_row, absolute):
+        ref_row = int(ref_row)
+        if absolute:
+            return f"R{ref_row}"
+        return f"R[{ref_row - row}]" if ref_row != row else "R"
+
+    def col_part(ref_col, absolute):
+        ref_col = column_index_from_string(ref_col)
+        if absolute:
+            return f"C{ref_col}"
+        return f"C[{ref_col - host_col}]" if ref_col != host_col else "C"
+
+    def replace(match):
+        if match['literal']:
+            return match['literal']
+        if match['col1']:
+            return (col_part(match['col1'], match['col1_abs']) + ":"
+                    + col_part(match['col2'], match['col2_abs']))
+        if match['row1']:
+            return (row_part(match['row1'], match['row1_abs']) + ":"
+                    + row_part(match['row2'], match['row2_abs']))
+        return (row_part(match['row'], match['row_abs'])
+                + col_part(match['col'], match['col_abs']))
+
+    return _A1_CELL_RE.sub(replace, formula)
+
+
 # Dataframe Handling
-def create_dataframes_from_excel(excel_filepath):
+def create_dataframes_from_excel(excel_filepath, strict=False,
+                                 max_rows=MAX_ROWS,
+                                 max_empty_rows=MAX_EMPTY_ROWS):
     try:
-        sheets_data = parse_excel_file(excel_filepath)
+        sheets_data = parse_excel_file(
+            excel_filepath, strict, max_rows, max_empty_rows)
         if not sheets_data:
             raise click.ClickException(
                 "No data was extracted from the Excel file.")
@@ -116,19 +362,30 @@ def create_dataframes_from_excel(excel_filepath):
 
 
 def organize_data_into_dataframes(sheet_data):
-    # Create a dataframe directly instead of using an intermediate list
+    # Turn each column into an object array, so pandas can take it as-is
+    # instead of inferring a dtype from a list
     df_data = {
-        'Cell': [],
-        'Formula': [],
-        'Referenced Cells': []
+        name: np.asarray(column, dtype=object)
+        for name, column in sheet_data_columns(sheet_data).items()
+    }
+
+    return [pd.DataFrame(df_data, copy=False)]  # Return a list with a single dataframe
+
+
+def sheet_data_columns(sheet_data):
+    # Each column built in a single pass over sheet_data
+    return {
+        'Cell': list(sheet_data),
+        'Formula': [data['formula'] for data in sheet_data.values()],
+        'Referenced Cells': [
+            format_referenced_cells(data['referenced_cells'])
+            for data in sheet_data.values()
+        ],
     }
 
-    for cell, data in sheet_data.items():
-        df_data['Cell'].append(cell)
-        df_data['Formula'].append(data['formula'])
-        df_data['Referenced Cells'].append(', '.join(data['referenced_cells']) if data['referenced_cells'] else 'None')
 
-    return [pd.DataFrame(df_data)]  # Return a list with a single dataframe
+def format_referenced_cells(referenced_cells):
+    return ', '.join(referenced_cells) if referenced_cells else 'None'
 
 
 def save_dataframes(dataframes, output_dir):
@@ -144,7 +401,15 @@ def save_dataframes(dataframes, output_dir):
                     continue
 
                 file_path = output_dir / f"{sheet_name}_df{i+1}.csv"
-                dataframe.to_csv(file_path, index=False)
+                if pa_csv is not None:
+                    # Arrow's writer is vectorised per column
+                    table = pa.Table.from_pandas(dataframe, preserve_index=False)
+                    pa_csv.write_csv(table, str(file_path))
+                    pa_feather.write_feather(
+                        table, str(file_path.with_suffix('.feather')))
+                else:
+                    dataframe.to_csv(file_path, index=False)
+                    remove_feather(file_path)
                 logger.info(f"Saved dataframe to {file_path}")
 
     except (IOError, OSError) as e:
@@ -152,43 +417,176 @@ def save_dataframes(dataframes, output_dir):
         raise
 
 
+# CSV Handling
+SHEET_DATA_HEADER = ['Cell', 'Formula', 'Referenced Cells']
+TEMPLATES_HEADER = ['Template ID', 'Formula', 'Referenced Cells']
+CELLS_HEADER = ['Cell', 'Template ID']
+
+
+def save_sheets_data(sheets_data, output_dir):
+    # Same files as save_dataframes, streamed row by row without pandas
+    try:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        for sheet_name, sheet_data in sheets_data.items():
+            if not sheet_data:
+                logger.info(f"Skipping empty data for {sheet_name}_df1")
+                continue
+
+            file_path = output_dir / f"{sheet_name}_df1.csv"
+            with file_path.open('w', newline='', encoding='utf-8') as csv_file:
+                writer = csv.writer(csv_file, lineterminator=os.linesep)
+                writer.writerow(SHEET_DATA_HEADER)
+                writer.writerows(
+                    (cell, data['formula'],
+                     format_referenced_cells(data['referenced_cells']))
+                    for cell, data in sheet_data.items()
+                )
+            logger.info(f"Saved sheet data to {file_path}")
+
+            if pa_feather is None:
+                remove_feather(file_path)
+            else:
+                save_feather(file_path, sheet_data_columns(sheet_data))
+
+    except (IOError, OSError) as e:
+        logger.error(f"Error saving sheet data to {output_dir}: {e}")
+        raise
+
+
+def save_sheets_templates(sheets_data, output_dir):
+    # Copy-filled formulas collapse to one R1C1 template each: <sheet>_templates
+    # lists the distinct templates and <sheet>_cells maps every cell to one
+    try:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        for sheet_name, sheet_data in sheets_data.items():
+            if not sheet_data:
+                logger.info(f"Skipping empty data for {sheet_name}")
+                continue
+
+            # Built as columns, which the feather copies take directly
+            template_ids = {}
+            templates = {name: [] for name in TEMPLATES_HEADER}
+            cells = {'Cell': list(sheet_data), 'Template ID': []}
+            for cell, data in sheet_data.items():
+                template = to_r1c1(data['formula'], cell)
+                template_id = template_ids.get(template)
+                if template_id is None:
+                    template_id = template_ids[template] = len(template_ids) + 1
+                    referenced_cells = data['referenced_cells'] and tuple(
+                        to_r1c1(ref, cell) for ref in data['referenced_cells'])
+                    templates['Template ID'].append(template_id)
+                    templates['Formula'].append(template)
+                    templates['Referenced Cells'].append(
+                        format_referenced_cells(referenced_cells))
+                cells['Template ID'].append(template_id)
+
+            templates_path = output_dir / f"{sheet_name}_templates.csv"
+            with templates_path.open('w', newline='', encoding='utf-8') as csv_file:
+                writer = csv.writer(csv_file, lineterminator=os.linesep)
+                writer.writerow(TEMPLATES_HEADER)
+                writer.writerows(zip(*templates.values()))
+
+            cells_path = output_dir / f"{sheet_name}_cells.csv"
+            with cells_path.open('w', newline='', encoding='utf-8') as csv_file:
+                writer = csv.writer(csv_file, lineterminator=os.linesep)
+                writer.writerow(CELLS_HEADER)
+                writer.writerows(zip(*cells.values()))
+
+            save_feather(templates_path, templates)
+            save_feather(cells_path, cells)
+
+            logger.info(
+                f"Saved {len(template_ids)} formula templates for {len(sheet_data)} "
+                f"cells to {templates_path} and {cells_path}")
+
+    except (IOError, OSError) as e:
+        logger.error(f"Error saving sheet templates to {output_dir}: {e}")
+        raise
+
+
+def save_feather(csv_path, columns):
+    # Arrow IPC copy of a CSV file, next to it; much faster to load than CSV
+    if pa_feather is None:
+        remove_feather(csv_path)
+        return
+
+    table = pa.table(columns)
+    feather_path = Path(csv_path).with_suffix('.feather')
+    pa_feather.write_feather(table, str(feather_path))
+    logger.info(f"Saved feather copy to {feather_path}")
+
+
+def remove_feather(csv_path):
+    # A copy left by an earlier run would no longer match the new CSV file
+    Path(csv_path).with_suffix('.feather').unlink(missing_ok=True)
+
+
 # Python CLI Code Generation
+CLI_TEMPLATE = """\
+# Auto-generated Python CLI based on Excel file
+import click
+import pandas as pd
+from pathlib import Path
+
+@click.group()
+def cli():
+    pass
+
+{commands}\
+if __name__ == '__main__':
+    cli()
+"""
+
+CLI_COMMAND_TEMPLATE = """\
+@cli.command()
+def {func_name}():
+    df_path = Path(__file__).parent / 'dataframes' / '{filename}'
+    feather_path = df_path.with_suffix('.feather')
+    df = None
+    # The CSV file may have been edited since the feather copy was written
+    if feather_path.exists() and (
+            not df_path.exists()
+            or feather_path.stat().st_mtime >= df_path.stat().st_mtime):
+        try:
+            df = pd.read_feather(feather_path)
+        except ImportError:  # pyarrow isn't installed; use the CSV file
+            pass
+    if df is None:
+        if not df_path.exists():
+            click.echo('Dataframe file {filename} does not exist.')
+            return
+        # Read 'None' and empty cells as text, the way the feather copy stores them
+        df = pd.read_csv(df_path, keep_default_na=False)
+    if df.empty:
+        click.echo('No data to display for {func_name}.')
+    else:
+        click.echo(df.to_string())
+
+"""
+
+
 def generate_python_cli_app(excel_filepath, output_dir):
     try:
         cli_script_path = Path(output_dir) / "main.py"
         dataframes_dir = Path(output_dir) / "dataframes"
 
-        # Move this check earlier to reduce nesting
-        if not dataframes_dir.exists() or not list(dataframes_dir.glob("*.csv")):
+        # Scan the directory once; sorting keeps the command order stable
+        csv_files = sorted(dataframes_dir.glob("*.csv"))
+        if not csv_files:
             raise click.ClickException(f"No dataframes found at {dataframes_dir}")
 
-        with cli_script_path.open('w') as cli_script:
-            cli_script.write("# Auto-generated Python CLI based on Excel file\n")
-            cli_script.write("import click\n")
-            cli_script.write("import pandas as pd\n")
-            cli_script.write("from pathlib import Path\n\n")
-
-            cli_script.write("@click.group()\n")
-            cli_script.write("def cli():\n")
-            cli_script.write("    pass\n\n")
-
-            for sheet_file in dataframes_dir.glob("*.csv"):
-                func_name = sheet_file.stem
-                logger.info(f"Generating CLI command for {func_name}")
-                cli_script.write(f"@cli.command()\n")
-                cli_script.write(f"def {func_name}():\n")
-                cli_script.write(f"    df_path = Path(__file__).parent / 'dataframes' / '{sheet_file.name}'\n")
-                cli_script.write(f"    if not df_path.exists():\n")
-                cli_script.write(f"        click.echo('Dataframe file {sheet_file.name} does not exist.')\n")
-                cli_script.write(f"        return\n")
-                cli_script.write(f"    df = pd.read_csv(df_path)\n")
-                cli_script.write(f"    if df.empty:\n")
-                cli_script.write(f"        click.echo('No data to display for {func_name}.')\n")
-                cli_script.write(f"    else:\n")
-                cli_script.write(f"        click.echo(df.to_string())\n\n")
-
-            cli_script.write("if __name__ == '__main__':\n")
-            cli_script.write("    cli()\n")
+        commands = []
+        for sheet_file in csv_files:
+            func_name = sheet_file.stem
+            logger.info(f"Generating CLI command for {func_name}")
+            commands.append(CLI_COMMAND_TEMPLATE.format(
+                func_name=func_name, filename=sheet_file.name))
+
+        cli_script_path.write_text(CLI_TEMPLATE.format(commands="".join(commands)))
 
         logger.info(f"Generated Python CLI at {cli_script_path}")
 
@@ -201,16 +599,14 @@ def generate_python_cli_app(excel_filepath, output_dir):
 
 def translate_excel_formulas_to_python(formula):
     try:
-        parser = formulas.Parser()
-        parser.parse(formula)
-        parsed_formula = parser.ast
-        # Convert parsed AST to Python code
+        builder = parser.ast(formula)[1]
+        # Compile the parsed AST into a Python callable
         # Note: This may require manual adjustments for complex Excel formulas
-        python_code = parsed_formula.to_python()
+        python_code = builder.compile()
 
         return python_code
 
-    except formulas.exc.FormulaError as e:
+    except formulas.errors.FormulaError as e:
         logger.warning(f"Error translating Excel formula '{formula}': {e}")
         return None  # Return None if translation fails
     except Exception as e:
@@ -230,17 +626,23 @@ def create_menu_for_multiple_functionalities(functionalities):
 
 
 # Output Handling
-def save_output_files(excel_filepath, dataframes):
+def save_output_files(excel_filepath, dataframes, save_data=save_dataframes):
     try:
         output_dir = Path("outputs") / Path(excel_filepath).stem
 
-        if not output_dir.exists():
-            output_dir.mkdir(parents=True, exist_ok=True)
+        output_dir.mkdir(parents=True, exist_ok=True)
 
         if not dataframes:
-            raise click.ClickException("No dataframes to save.")
+            raise click.ClickException("No data to save.")
+
+        # Every file left in dataframes/ becomes a CLI command, so clear out
+        # the ones from earlier runs (possibly in another output mode)
+        dataframes_dir = output_dir / "dataframes"
+        for pattern in ("*.csv", "*.feather"):
+            for stale_file in dataframes_dir.glob(pattern):
+                stale_file.unlink()
 
-        save_dataframes(dataframes, output_dir / "dataframes")
+        save_data(dataframes, dataframes_dir)
         generate_python_cli_app(excel_filepath, output_dir)
 
     except click.ClickException as e:
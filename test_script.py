@@ -0,0 +1,274 @@
+import csv
+import os
+import re
+import shelve
+import subprocess
+import sys
+import zipfile
+from contextlib import nullcontext
+
+import pytest
+from openpyxl import Workbook
+
+import script
+
+
+def test_text_starting_with_equals_is_not_a_formula(tmp_path):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet['A1'] = '=B1'
+    # Quote-prefixed text: stored as a string that starts with '='
+    sheet['A2'] = '=B1'
+    sheet['A2'].data_type = 's'
+    sheet['A2'].quotePrefix = True
+    excel_filepath = tmp_path / "quoted.xlsx"
+    workbook.save(excel_filepath)
+
+    sheets_data = script.parse_excel_file(excel_filepath)
+
+    assert list(sheets_data['Sheet']) == ['A1']
+
+
+def test_sheet_with_under_reported_dimension_is_read_in_full(tmp_path):
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in range(2, 9):
+        sheet[f'B{row}'] = f'=A{row}'
+    source = tmp_path / "source.xlsx"
+    workbook.save(source)
+
+    # Rewrite the recorded dimension as A1:B3, as some writers do
+    excel_filepath = tmp_path / "dimension.xlsx"
+    with zipfile.ZipFile(source) as zin, \
+            zipfile.ZipFile(excel_filepath, 'w') as zout:
+        for item in zin.infolist():
+            data = zin.read(item.filename)
+            if item.filename == 'xl/worksheets/sheet1.xml':
+                data = re.sub(rb'<dimension ref="[^"]*"\s*/>',
+                              b'<dimension ref="A1:B3"/>', data)
+            zout.writestr(item, data)
+
+    sheets_data = script.parse_excel_file(excel_filepath)
+
+    assert list(sheets_data['Sheet']) == [f'B{row}' for row in range(2, 9)]
+
+
+@pytest.mark.parametrize("formula, expected", [
+    ('=A1+$B$2*C$3', ('A1', '$B$2', 'C$3')),
+    ('=SUM(A1:B2)', ('A1:B2',)),
+    ('=SUM(A:A)+SUM($B:$C)', ('A:A', '$B:$C')),
+    ('=SUM(1:1)+SUM($2:$5)', ('1:1', '$2:$5')),
+    ('=Sheet2!C3+Sheet2!A:A', ('Sheet2!C3', 'Sheet2!A:A')),
+    ("='My Sheet'!A1+'Bob''s'!$A$1:B$2", ("'My Sheet'!A1", "'Bob''s'!$A$1:B$2")),
+    ("='Q1 Data'!1:3", ("'Q1 Data'!1:3",)),
+    ('=IF(C1="A1",1,"B2:B3")', ('C1',)),
+    ('=LOG10(B2)+ATAN2(AB12,1)', ('B2', 'AB12')),
+    ('=Tax_Rate*A1', ('A1',)),
+    ('=[1]Sheet1!A1+B2', ('[1]Sheet1!A1', 'B2')),
+    ("='[1]My Sheet'!A1", ("'[1]My Sheet'!A1",)),
+])
+def test_get_referenced_cells(formula, expected):
+    assert script.get_referenced_cells(formula) == expected
+
+
+def test_formulas_after_a_large_gap_are_extracted(tmp_path):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet['A1'] = '=B1'
+    sheet['A2000'] = '=B2'
+    excel_filepath = tmp_path / "gap.xlsx"
+    workbook.save(excel_filepath)
+
+    assert list(script.parse_excel_file(excel_filepath)['Sheet']) == ['A1', 'A2000']
+    assert list(script.parse_excel_file(
+        excel_filepath, max_empty_rows=1000)['Sheet']) == ['A1']
+
+
+@pytest.mark.parametrize("formula, coordinate, expected", [
+    ('=A1*2', 'B1', '=RC[-1]*2'),
+    ('=A2*2', 'B2', '=RC[-1]*2'),
+    ('=$A$1+A$1+$A1', 'C3', '=R1C1+R1C[-2]+R[-2]C1'),
+    ('=SUM($A$1:A5)', 'D5', '=SUM(R1C1:RC[-3])'),
+    ("='Q1 Data'!C3+Sheet2!B2", 'D5', "='Q1 Data'!R[-2]C[-1]+Sheet2!R[-3]C[-2]"),
+    ('=IF(A1="B2",1,0)', 'A2', '=IF(R[-1]C="B2",1,0)'),
+    ('=LOG10(B5)+Tax_Rate', 'A1', '=LOG10(R[4]C[1])+Tax_Rate'),
+    ('=SUM(A:A)+A1', 'B1', '=SUM(C[-1]:C[-1])+RC[-1]'),
+    ('=SUM($A:C)', 'B1', '=SUM(C1:C[1])'),
+    ('=SUM(1:3)+SUM($1:$1)', 'A2', '=SUM(R[-1]:R[1])+SUM(R1:R1)'),
+    ("=Sheet2!B:B+'Q1 Data'!2:2", 'B2', "=Sheet2!C:C+'Q1 Data'!R:R"),
+])
+def test_to_r1c1(formula, coordinate, expected):
+    assert script.to_r1c1(formula, coordinate) == expected
+
+
+def test_copy_filled_cells_share_a_template(tmp_path):
+    sheets_data = {'Sheet': {
+        'B1': {'formula': '=A1*2', 'referenced_cells': ('A1',)},
+        'B2': {'formula': '=A2*2', 'referenced_cells': ('A2',)},
+        'B3': {'formula': '=$A$1*2', 'referenced_cells': ('$A$1',)},
+        'C1': {'formula': '=SUM(B:B)', 'referenced_cells': ('B:B',)},
+        'D1': {'formula': '=SUM(C:C)', 'referenced_cells': ('C:C',)},
+    }}
+
+    script.save_sheets_templates(sheets_data, tmp_path)
+
+    with (tmp_path / "Sheet_templates.csv").open(encoding='utf-8') as f:
+        assert list(csv.reader(f)) == [
+            ['Template ID', 'Formula', 'Referenced Cells'],
+            ['1', '=RC[-1]*2', 'RC[-1]'],
+            ['2', '=R1C1*2', 'R1C1'],
+            ['3', '=SUM(C[-1]:C[-1])', 'C[-1]:C[-1]'],
+        ]
+    with (tmp_path / "Sheet_cells.csv").open(encoding='utf-8') as f:
+        assert list(csv.reader(f)) == [
+            ['Cell', 'Template ID'], ['B1', '1'], ['B2', '1'], ['B3', '2'],
+            ['C1', '3'], ['D1', '3'],
+        ]
+
+
+def test_rerun_in_another_mode_replaces_old_output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sheets_data = {'Sheet': {'B1': {'formula': '=A1', 'referenced_cells': ('A1',)}}}
+
+    script.save_output_files("t.xlsx", sheets_data, script.save_sheets_data)
+    script.save_output_files("t.xlsx", sheets_data, script.save_sheets_templates)
+
+    dataframes_dir = tmp_path / "outputs" / "t" / "dataframes"
+    assert sorted(p.stem for p in dataframes_dir.glob("*.csv")) == [
+        'Sheet_cells', 'Sheet_templates']
+    assert 'Sheet_df1' not in (tmp_path / "outputs" / "t" / "main.py").read_text()
+
+
+def test_generated_cli_prefers_an_edited_csv_over_feather(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.chdir(tmp_path)
+    sheets_data = {'Main': {
+        'B1': {'formula': '=A1', 'referenced_cells': ('A1',)},
+        'B2': {'formula': '=PI()', 'referenced_cells': ()},
+    }}
+    script.save_output_files("t.xlsx", sheets_data, script.save_sheets_data)
+
+    output_dir = tmp_path / "outputs" / "t"
+    csv_path = output_dir / "dataframes" / "Main_df1.csv"
+    feather_path = csv_path.with_suffix('.feather')
+    command = [sys.executable, str(output_dir / "main.py"), "main-df1"]
+    from_feather = subprocess.run(command, capture_output=True, text=True, check=True)
+    feather_path.rename(feather_path.with_suffix('.bak'))
+    from_csv = subprocess.run(command, capture_output=True, text=True, check=True)
+    assert "None" in from_csv.stdout and "NaN" not in from_csv.stdout
+    assert from_csv.stdout == from_feather.stdout
+
+    feather_path.with_suffix('.bak').rename(feather_path)
+    csv_path.write_text("Cell,Formula,Referenced Cells\nC9,=Z9,Z9\n", encoding='utf-8')
+    feather_mtime = feather_path.stat().st_mtime
+    os.utime(csv_path, (feather_mtime + 1, feather_mtime + 1))
+
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+
+    assert "C9" in result.stdout and "B1" not in result.stdout
+
+
+def test_feather_copy_is_removed_without_pyarrow(tmp_path, monkeypatch):
+    csv_path = tmp_path / "Sheet_df1.csv"
+    feather_path = csv_path.with_suffix('.feather')
+    feather_path.write_bytes(b"old")
+    monkeypatch.setattr(script, "pa_feather", None)
+
+    script.save_sheets_data(
+        {'Sheet': {'B1': {'formula': '=A1', 'referenced_cells': ('A1',)}}}, tmp_path)
+
+    assert csv_path.exists() and not feather_path.exists()
+
+
+def test_extract_formulas_from_regular_worksheet():
+    sheet = Workbook().active
+    assert script.extract_formulas_from_sheet(sheet) is None
+
+    sheet['A1'] = '=B1'
+    assert script.extract_formulas_from_sheet(sheet) == [('A1', '=B1')]
+
+
+def write_strict_workbook(tmp_path):
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in range(1, 21):
+        sheet[f'B{row}'] = f'=A{row}*2+SUM(C1:C{row})'
+    workbook.create_sheet('Other')['A1'] = '=Sheet!B3+Tax_Rate'
+    excel_filepath = tmp_path / "strict.xlsx"
+    workbook.save(excel_filepath)
+    return excel_filepath
+
+
+def test_strict_parse_in_worker_processes_matches_in_process(tmp_path, monkeypatch):
+    excel_filepath = write_strict_workbook(tmp_path)
+
+    monkeypatch.setattr(script, "FORMULA_CACHE_PATH", tmp_path / "serial" / "ast.db")
+    in_process = script.parse_excel_file(excel_filepath, strict=True)
+
+    pools = []
+
+    class RecordingExecutor(script.ProcessPoolExecutor):
+        def map(self, *args, **kwargs):
+            pools.append(self)
+            return super().map(*args, **kwargs)
+
+    # One formula per task, so every miss goes through the process pool
+    monkeypatch.setattr(script, "ProcessPoolExecutor", RecordingExecutor)
+    monkeypatch.setattr(script, "FORMULA_BATCH_SIZE", 1)
+    monkeypatch.setattr(script, "FORMULA_CACHE_PATH", tmp_path / "pooled" / "ast.db")
+    pooled = script.parse_excel_file(excel_filepath, strict=True)
+
+    assert len(pools) == 1
+    assert pooled == in_process
+    assert pooled['Other']['A1']['referenced_cells'] == ('SHEET!B3', 'TAX_RATE')
+
+
+def test_strict_cache_is_reused_between_runs(tmp_path, monkeypatch):
+    excel_filepath = write_strict_workbook(tmp_path)
+    monkeypatch.setattr(script, "FORMULA_CACHE_PATH", tmp_path / "cache" / "ast.db")
+    first = script.parse_excel_file(excel_filepath, strict=True)
+
+    with shelve.open(str(script.FORMULA_CACHE_PATH)) as cache:
+        key = script.formula_cache_key('=Sheet!B3+Tax_Rate')
+        assert cache[key] == ('SHEET!B3', 'TAX_RATE')
+
+    def fail(formula, strict=False):
+        raise AssertionError(f"{formula} was parsed again")
+
+    monkeypatch.setattr(script, "get_referenced_cells", fail)
+    assert script.parse_excel_file(excel_filepath, strict=True) == first
+
+
+def test_strict_cache_key_includes_parser_version(monkeypatch):
+    key = script.formula_cache_key('=A1')
+    monkeypatch.setattr(script.formulas, "__version__", "0.0.0")
+    assert script.formula_cache_key('=A1') != key
+
+
+def test_strict_parse_failures_are_not_cached(tmp_path, monkeypatch):
+    workbook = Workbook()
+    workbook.active['A1'] = '=B1'
+    workbook.active['A2'] = '=IF(B1="x",1,2'
+    excel_filepath = tmp_path / "malformed.xlsx"
+    workbook.save(excel_filepath)
+    monkeypatch.setattr(script, "FORMULA_CACHE_PATH", tmp_path / "cache" / "ast.db")
+
+    sheets_data = script.parse_excel_file(excel_filepath, strict=True)
+
+    assert list(sheets_data['Sheet']) == ['A1']
+    with shelve.open(str(script.FORMULA_CACHE_PATH)) as cache:
+        assert script.formula_cache_key('=B1') in cache
+        assert script.formula_cache_key('=IF(B1="x",1,2') not in cache
+
+
+def test_strict_parse_works_without_a_cache(tmp_path, monkeypatch):
+    excel_filepath = write_strict_workbook(tmp_path)
+    # A file where the cache directory should be makes opening it fail
+    (tmp_path / "not_a_dir").write_text("")
+    monkeypatch.setattr(
+        script, "FORMULA_CACHE_PATH", tmp_path / "not_a_dir" / "ast.db")
+
+    assert isinstance(script.open_formula_cache(), nullcontext)
+    sheets_data = script.parse_excel_file(excel_filepath, strict=True)
+
+    assert len(sheets_data['Sheet']) == 20